@@ -1,12 +1,34 @@
 from core.ingestion.international.base_client import BaseIngestionClient
-from edgar import set_identity, Company, Filings
+from core.ingestion.sec_throttle import SEC_THROTTLE
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import List, Dict, Optional
+import httpx
+import logging
 import os
+import re
+
+logger = logging.getLogger(__name__)
 
 # Set identity for SEC EDGAR compliance (from environment or default)
 # Real users must set this environment variable
 identity = os.environ.get("SEC_IDENTITY", "Research Agent contact@example.com")
-set_identity(identity)
+
+# edgartools is imported lazily so that importing this module (tests, CLI, RAG-only
+# paths) doesn't pay for initializing it; the identity is set on first client creation.
+_IDENTITY_SET = False
+
+
+def _ensure_identity() -> None:
+    global _IDENTITY_SET
+    if not _IDENTITY_SET:
+        from edgar import set_identity
+        set_identity(identity)
+        _IDENTITY_SET = True
+
+# Identifies the press-release exhibit (Exhibit 99.1) by description or file name,
+# e.g. "EX-99.1", "ex991.htm", "ex99-1.htm", "Press Release"; not EX-99.10+
+_PR_RE = re.compile(r'EX-?99[.-]?1(?!\d)|PRESS RELEASE', re.I)
+
 
 class EdgarClient(BaseIngestionClient):
     """
@@ -14,110 +36,153 @@ class EdgarClient(BaseIngestionClient):
     Automatically handles rate limiting via the library.
     """
     
+    MAX_WORKERS = 8
+
+    def __init__(self, include_main_when_exhibit_present: bool = False):
+        """
+        include_main_when_exhibit_present: also fetch the main filing body when an
+        Exhibit 99.1 press release exists (by default only the exhibit is fetched).
+        """
+        _ensure_identity()
+        self.include_main_when_exhibit_present = include_main_when_exhibit_present
+
     def get_latest_filings(self, tickers: List[str], limit: int = 5) -> List[Dict]:
         """
         Fetches the latest 8-K filings for a list of tickers.
+        Tickers are fetched concurrently; results keep the input ticker order.
         """
+        if not tickers:
+            return []
+
+        by_ticker: Dict[str, List[Dict]] = {}
+        with ThreadPoolExecutor(max_workers=min(self.MAX_WORKERS, len(tickers))) as executor:
+            futures = {executor.submit(self._fetch_one, ticker, limit): ticker for ticker in tickers}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    by_ticker[ticker] = future.result()
+                except Exception:
+                    logger.exception("Unexpected error fetching filings for %s", ticker)
+
         results = []
         for ticker in tickers:
-            try:
+            results.extend(by_ticker.get(ticker, []))
+        return results
+
+    def _fetch_one(self, ticker: str, limit: int) -> List[Dict]:
+        """Fetches the latest 8-K filings for a single ticker."""
+        from edgar import Company
+
+        results = []
+        try:
+            with SEC_THROTTLE.acquire():
                 company = Company(ticker)
-                # Filter for 8-K filings
+            # Filter for 8-K filings
+            with SEC_THROTTLE.acquire():
                 filings_container = company.get_filings(form="8-K").latest(limit)
-                
-                # If it's a single Filing object (not a list/container), wrap it
-                # edgartools consistency varies, check provided methods
-                if hasattr(filings_container, 'accession_no'):
-                    # It's a single filing
-                    iterable_filings = [filings_container]
-                else:
-                    # It's a container, iterate over it
-                    iterable_filings = filings_container
-
-                for filing in iterable_filings:
-                    # Double check it has the attribute
-                    if not hasattr(filing, 'accession_no'):
-                        continue
-                        
-                    results.append({
-                        "ticker": ticker,
-                        "accession_number": filing.accession_no,
-                        "filing_date": str(filing.filing_date),
-                        "form": filing.form,
-                        "url": filing.url if hasattr(filing, 'url') else "",
-                        "filing_obj": filing 
-                    })
-            except Exception as e:
-                print(f"Error fetching filings for {ticker}: {e}")
-        
+            if filings_container is None:
+                return results
+
+            # If it's a single Filing object (not a list/container), wrap it
+            # edgartools consistency varies, check provided methods
+            single = getattr(filings_container, 'accession_no', None)
+            iterable_filings = (filings_container,) if single is not None else filings_container
+
+            for filing in iterable_filings:
+                # Double check it has the attribute
+                accession = getattr(filing, 'accession_no', None)
+                if accession is None:
+                    continue
+
+                results.append({
+                    "ticker": ticker,
+                    "accession_number": accession,
+                    "filing_date": str(filing.filing_date),
+                    "form": filing.form,
+                    "url": getattr(filing, 'url', ""),
+                    "filing_obj": filing
+                })
+        except (httpx.HTTPError, LookupError, AttributeError) as e:
+            logger.warning("Error fetching filings for %s: %s", ticker, e)
+
         return results
 
     def get_filing_text(self, filing_obj) -> Optional[str]:
         """
         Fetches the content of a filing using edgartools methods.
-        Prioritizes Exhibit 99.1 (Press Release) if available, 
-        concatenating it with the main filing text.
+        Prioritizes Exhibit 99.1 (Press Release) if available: for earnings 8-Ks the
+        main filing is mostly cover-page boilerplate, so it is only fetched when no
+        press release exists or include_main_when_exhibit_present is set.
         """
         try:
             if not filing_obj:
                 return None
-                
+
+            # 1. Check for Exhibit 99.1 (Press Release)
+            exhibit_text = self._get_press_release_text(filing_obj)
+
+            # 2. Get main filing text
+            main_text = None
+            if not exhibit_text or self.include_main_when_exhibit_present:
+                with SEC_THROTTLE.acquire():
+                    if hasattr(filing_obj, 'markdown'):
+                        main_text = filing_obj.markdown()
+                    elif hasattr(filing_obj, 'text'):
+                        main_text = filing_obj.text()
+
             content = ""
-            
-            # 1. Get main filing text
-            if hasattr(filing_obj, 'markdown'):
-                main_text = filing_obj.markdown()
-            elif hasattr(filing_obj, 'text'):
-                main_text = filing_obj.text()
-            else:
-                main_text = ""
-                
             if main_text:
                 content += f"--- MAIN FILING (FORM {filing_obj.form}) ---\n{main_text}\n"
+            elif exhibit_text:
+                content += f"--- FORM {filing_obj.form} (main filing omitted) ---\n"
+            if exhibit_text:
+                content += f"\n\n--- EXHIBIT 99.1 (PRESS RELEASE) ---\n{exhibit_text}"
 
-            # 2. Check for Exhibit 99.1 (Press Release)
-            if hasattr(filing_obj, 'attachments'):
-                # attachments is a list-like object
-                for attachment in filing_obj.attachments:
-                    # Check description or filename. Usually 'EX-99.1' or 'ex99-1'
-                    desc = getattr(attachment, 'description', '').upper()
-                    doc_name = getattr(attachment, 'document', '').upper()
-                    
-                    is_press_release = (
-                        'EX-99.1' in desc or 
-                        'PRESS RELEASE' in desc or 
-                        'EX991' in doc_name or
-                        'EX-99.1' in doc_name
-                    )
-
-                    if is_press_release:
-                        print(f"  📎 Found Exhibit 99.1 ({doc_name}), extracting...")
-                        
-                        att_text = None
-                        # Prefer markdown from attachment if the library supports it
-                        if hasattr(attachment, 'markdown'):
-                            att_text = attachment.markdown()
-                        elif hasattr(attachment, 'text'):
-                            att_text = attachment.text()
-                        elif hasattr(attachment, 'download'):
-                            # download() usually returns the raw document (HTML or Text)
-                            # We'll treat it as text/html for now
-                            att_text = attachment.download()
-                            if isinstance(att_text, bytes):
-                                att_text = att_text.decode('utf-8', errors='ignore')
-                        
-                        if att_text:
-                            content += f"\n\n--- EXHIBIT 99.1 (PRESS RELEASE) ---\n{att_text}"
-            
             return content.strip() if content else None
-        except Exception as e:
-            print(f"Error extracting text from filing: {e}")
+        except Exception:
+            logger.exception("Error extracting text from filing")
+            return None
+
+    def _get_press_release_text(self, filing_obj) -> Optional[str]:
+        """Returns the text of the filing's Exhibit 99.1, or None if it has none."""
+        if not hasattr(filing_obj, 'attachments'):
             return None
 
+        # attachments is a list-like object
+        for attachment in filing_obj.attachments:
+            # Check description or filename. Usually 'EX-99.1' or 'ex99-1'
+            desc = getattr(attachment, 'description', '') or ''
+            doc_name = getattr(attachment, 'document', '') or ''
+            if not (_PR_RE.search(desc) or _PR_RE.search(doc_name)):
+                continue
+
+            logger.debug("📎 Found Exhibit 99.1 (%s), extracting...", doc_name)
+
+            att_text = None
+            with SEC_THROTTLE.acquire():
+                # Prefer markdown from attachment if the library supports it
+                if hasattr(attachment, 'markdown'):
+                    att_text = attachment.markdown()
+                elif hasattr(attachment, 'text'):
+                    att_text = attachment.text()
+                elif hasattr(attachment, 'download'):
+                    # download() usually returns the raw document (HTML or Text)
+                    # We'll treat it as text/html for now
+                    # TODO drop download(): it materializes the whole document as bytes;
+                    # markdown()/text() above are preferred whenever available.
+                    att_text = attachment.download()
+            if isinstance(att_text, bytes):
+                att_text = att_text.decode('utf-8', errors='ignore')
+            # An 8-K carries at most one Exhibit 99.1
+            return att_text or None
+
+        return None
+
 if __name__ == "__main__":
     # Test
+    logging.basicConfig(level=logging.INFO)
     client = EdgarClient()
-    print("Fetching NVDA 8-Ks...")
-    filings = client.get_latest_8k_filings(["NVDA"], limit=2)
+    logger.info("Fetching NVDA 8-Ks...")
+    filings = client.get_latest_filings(["NVDA"], limit=2)
     for f in filings:
-        print(f"- {f['filing_date']} | {f['accession_number']} | {f['url']}")
+        logger.info("- %s | %s | %s", f['filing_date'], f['accession_number'], f['url'])
@@ -1,15 +1,20 @@
 import time
 import os
 import logging
+import queue
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Optional
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from core.ingestion.international.base_client import BaseIngestionClient
 from core.ingestion.international.market_registry import MarketRegistry
 from core.ingestion.state_manager import StateManager
 from core.extraction.engine import ExtractionEngine
-from core.synthesis.hybrid_rag import HybridRAGEngine
 from core.models import EarningsReport
-from core.notifications.client import NotificationClient
+
+if TYPE_CHECKING:
+    # Imported lazily in _get_rag/_get_notifier; chromadb in particular is slow to import.
+    from core.synthesis.hybrid_rag import HybridRAGEngine
+    from core.notifications.client import NotificationClient
 
 class PollingEngine:
     """
@@ -18,20 +23,29 @@ class PollingEngine:
     2. Checks SQLite state to avoid duplicates.
     3. Triggers Extraction + RAG Indexing.
     """
+    # Each worker issues 1-3 SEC requests per filing; 4 keeps the pool well
+    # inside the shared 10 req/s SEC budget.
+    DEFAULT_MAX_WORKERS = 4
+    # Bounds how far fetching can run ahead of processing.
+    QUEUE_SIZE = 16
+
     def __init__(self, tickers: List[str], max_workers: Optional[int] = None):
         self.tickers = tickers
         self.registry = MarketRegistry()
         self.extractor = ExtractionEngine()
-        self.rag: Optional[HybridRAGEngine] = None
-        self.notifier: Optional[NotificationClient] = None
+        self.rag: Optional["HybridRAGEngine"] = None
+        self.notifier: Optional["NotificationClient"] = None
         self.logger = logging.getLogger(self.__class__.__name__)
-        self._state_local = threading.local()
-        self.max_workers = max_workers or min(32, (os.cpu_count() or 1) + 4)
-
-    def _get_state_manager(self) -> StateManager:
-        if not hasattr(self._state_local, "state"):
-            self._state_local.state = StateManager()
-        return self._state_local.state
+        # StateManager is thread-safe; all workers share one connection.
+        self.state = StateManager()
+        # Marks are buffered per cycle and committed in one transaction by _flush_marks().
+        # Keyed by accession so a mark whose flush failed is kept once and still counts
+        # as processed until a later flush succeeds.
+        self._pending_marks: Dict[str, Tuple[str, str, str]] = {}
+        self._marks_lock = threading.Lock()
+        # Guards the lazy rag/notifier initializers, which run from consumer threads
+        self._init_lock = threading.Lock()
+        self.max_workers = max_workers or self.DEFAULT_MAX_WORKERS
 
     def _process_filing(self, filing: dict, client) -> None:
         accession = filing.get('accession_number')
@@ -43,8 +57,9 @@ class PollingEngine:
 
         self.logger.info("➡️ Starting task for %s %s", ticker, accession)
         try:
-            state = self._get_state_manager()
-            if state.is_processed(accession):
+            with self._marks_lock:
+                pending = accession in self._pending_marks
+            if pending or self.state.is_processed(accession):
                 self.logger.info("Skipping %s %s (Already processed)", ticker, accession)
                 return
 
@@ -83,7 +98,8 @@ class PollingEngine:
             if filing_date is None:
                 self.logger.warning("Missing filing_date for %s %s", ticker, accession)
                 filing_date = ""
-            state.mark_processed(accession, ticker, filing_date)
+            with self._marks_lock:
+                self._pending_marks[accession] = (accession, ticker, filing_date)
             self.logger.info("✅ Processed %s %s", ticker, accession)
 
         except Exception:
@@ -107,49 +123,96 @@ class PollingEngine:
         # Let's use the registry's grouping logic
         groups = self.registry.group_tickers_by_market(self.tickers)
 
-        for market, market_tickers in groups.items():
-            if not market_tickers:
-                continue
+        # Fetching (network-bound) and per-filing processing (LLM-bound) overlap:
+        # this thread produces filings market by market while consumers process them.
+        work: "queue.Queue[Optional[Tuple[dict, BaseIngestionClient]]]" = queue.Queue(maxsize=self.QUEUE_SIZE)
+        consumers = [
+            threading.Thread(target=self._consume, args=(work,), name=f"filing-worker-{i}", daemon=True)
+            for i in range(self.max_workers)
+        ]
+        for consumer in consumers:
+            consumer.start()
+
+        cycle_seen = set()
+        try:
+            for market, market_tickers in groups.items():
+                if not market_tickers:
+                    continue
 
-            self.logger.info("🌍 querying %s for %s...", market.upper(), market_tickers)
-            # We can grab any client instance from the registry for that market
-            # Since our registry logic is per-ticker, let's just grab the first one
-            # Ideally Registry gives us the client for the group
-            client = self.registry.get_client(market_tickers[0]) # Valid since they are grouped
+                self.logger.info("🌍 querying %s for %s...", market.upper(), market_tickers)
+                # We can grab any client instance from the registry for that market
+                # Since our registry logic is per-ticker, let's just grab the first one
+                # Ideally Registry gives us the client for the group
+                client = self.registry.get_client(market_tickers[0]) # Valid since they are grouped
 
+                try:
+                    filings = client.get_latest_filings(market_tickers)
+                except Exception:
+                    self.logger.exception("Failed fetching filings for %s", market_tickers)
+                    continue
+
+                for filing in filings or []:
+                    # Overlapping results (cross-listings, retries) must not reach the extractor twice
+                    accession = filing.get('accession_number')
+                    if accession:
+                        if accession in cycle_seen:
+                            self.logger.info("Skipping %s (already queued this cycle)", accession)
+                            continue
+                        cycle_seen.add(accession)
+                    work.put((filing, client))
+        finally:
+            for _ in consumers:
+                work.put(None)
+            for consumer in consumers:
+                consumer.join()
+            self._flush_marks()
+
+    def _consume(self, work: "queue.Queue[Optional[Tuple[dict, BaseIngestionClient]]]") -> None:
+        """Worker loop: processes queued filings until it receives the None sentinel."""
+        while True:
+            item = work.get()
+            if item is None:
+                return
+            filing, client = item
             try:
-                filings = client.get_latest_filings(market_tickers)
+                self._process_filing(filing, client)
             except Exception:
-                self.logger.exception("Failed fetching filings for %s", market_tickers)
-                continue
-
-            if not filings:
-                continue
+                self.logger.exception(
+                    "❌ Unhandled exception for %s %s", filing.get('ticker'), filing.get('accession_number')
+                )
 
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = {
-                    executor.submit(self._process_filing, filing, client): filing
-                    for filing in filings
-                }
-                for future in as_completed(futures):
-                    filing = futures[future]
-                    accession = filing.get('accession_number')
-                    ticker = filing.get('ticker')
-                    try:
-                        future.result()
-                    except Exception:
-                        self.logger.exception("❌ Unhandled exception for %s %s", ticker, accession)
+    def _flush_marks(self) -> None:
+        """Commits the marks buffered during this cycle in a single transaction."""
+        with self._marks_lock:
+            pending, self._pending_marks = self._pending_marks, {}
+        if pending:
+            if self.state.mark_processed_bulk(pending.values()):
+                self.logger.info("💾 Marked %d filings as processed.", len(pending))
+            else:
+                # Keep them queued so the next flush retries instead of silently dropping them
+                with self._marks_lock:
+                    self._pending_marks.update(pending)
+                self.logger.error("Failed to mark %d filings; will retry next cycle.", len(pending))
+        self.state.maybe_optimize()
 
     def start_loop(self, interval_seconds: int = 60):
         """Legacy simple loop. Use start_scheduled() for production."""
         if interval_seconds <= 0:
             raise ValueError("interval_seconds must be positive")
         self.logger.info("🚀 Starting Polling Engine (Simple Loop)...")
+        # Schedule against a monotonic deadline so cycle duration doesn't add drift.
+        deadline = time.monotonic()
         while True:
             try:
                 self.run_once()
-                self.logger.info("Sleeping for %ss...", interval_seconds)
-                time.sleep(interval_seconds)
+                deadline += interval_seconds
+                sleep_for = deadline - time.monotonic()
+                if sleep_for > 0:
+                    self.logger.info("Sleeping for %.1fs...", sleep_for)
+                    time.sleep(sleep_for)
+                else:
+                    self.logger.warning("Polling cycle overran by %.1fs", -sleep_for)
+                    deadline = time.monotonic()
             except KeyboardInterrupt:
                 self.logger.info("Stopping poller.")
                 break
@@ -254,25 +317,28 @@ class PollingEngine:
         os.makedirs(output_dir, exist_ok=True)
         filename = f"{output_dir}/{ticker}_{accession}.md"
 
-        with open(filename, "w") as f:
-            f.write(f"# 📊 Earnings Note: {report.company_name} ({report.ticker})\n")
-            f.write(f"**Fiscal Period**: {report.fiscal_period}\n")
-            f.write(f"**ID**: {accession}\n\n")
+        parts = []
+        append = parts.append
+        append(f"# 📊 Earnings Note: {report.company_name} ({report.ticker})\n")
+        append(f"**Fiscal Period**: {report.fiscal_period}\n")
+        append(f"**ID**: {accession}\n\n")
+
+        append("## 🟢 Key KPIs\n")
+        for kpi in report.kpis:
+            append(f"- **{kpi.name}**: {kpi.value_actual} (Context: {kpi.context})\n")
 
-            f.write("## 🟢 Key KPIs\n")
-            for kpi in report.kpis:
-                f.write(f"- **{kpi.name}**: {kpi.value_actual} (Context: {kpi.context})\n")
+        append("\n## 🧭 Guidance\n")
+        for guide in report.guidance:
+            append(f"- **{guide.metric}**: {guide.midpoint} {guide.unit} ({guide.commentary})\n")
 
-            f.write("\n## 🧭 Guidance\n")
-            for guide in report.guidance:
-                f.write(f"- **{guide.metric}**: {guide.midpoint} {guide.unit} ({guide.commentary})\n")
+        if report.summary:
+            append("\n## 📝 Summary\n")
+            if report.summary.bull_case:
+                append("**Bull Case**:\n" + "\n".join([f"- {i}" for i in report.summary.bull_case]) + "\n")
+            if report.summary.bear_case:
+                append("**Bear Case**:\n" + "\n".join([f"- {i}" for i in report.summary.bear_case]) + "\n")
 
-            if report.summary:
-                f.write("\n## 📝 Summary\n")
-                if report.summary.bull_case:
-                    f.write("**Bull Case**:\n" + "\n".join([f"- {i}" for i in report.summary.bull_case]) + "\n")
-                if report.summary.bear_case:
-                    f.write("**Bear Case**:\n" + "\n".join([f"- {i}" for i in report.summary.bear_case]) + "\n")
+        Path(filename).write_text("".join(parts), encoding="utf-8")
 
         # Send Notification
         notifier = self._get_notifier()
@@ -338,14 +404,21 @@ class PollingEngine:
             rag.add_documents(documents)
             self.logger.info("✅ Indexed %d documents for %s into Hybrid RAG.", len(documents), ticker)
 
-    def _get_notifier(self) -> NotificationClient:
+    def _get_notifier(self) -> "NotificationClient":
         if self.notifier is None:
-            self.notifier = NotificationClient()
+            with self._init_lock:
+                if self.notifier is None:
+                    from core.notifications.client import NotificationClient
+                    self.notifier = NotificationClient()
         return self.notifier
 
-    def _get_rag(self) -> HybridRAGEngine:
+    def _get_rag(self) -> "HybridRAGEngine":
+        # Double-checked so only one HybridRAGEngine (and BM25 index) is ever built
         if self.rag is None:
-            self.rag = HybridRAGEngine()
+            with self._init_lock:
+                if self.rag is None:
+                    from core.synthesis.hybrid_rag import HybridRAGEngine
+                    self.rag = HybridRAGEngine()
         return self.rag
 
 if __name__ == "__main__":
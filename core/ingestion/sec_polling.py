@@ -1,10 +1,16 @@
-import feedparser
 import time
-import requests
+import httpx
 import json
+import logging
 import os
-from bs4 import BeautifulSoup
+import re
+from collections import OrderedDict
+from lxml import etree
 from typing import List, Dict, Optional
+from core.ingestion.sec_throttle import SEC_THROTTLE
+from core.ingestion.state_manager import StateManager
+
+logger = logging.getLogger(__name__)
 
 class SECPoller:
     """
@@ -13,52 +19,118 @@ class SECPoller:
     """
     RSS_URL = "https://www.sec.gov/cgi-bin/browse-edgar?action=getcurrent&type=8-K&company=&dateb=&owner=include&start=0&count=40&output=atom"
     
-    def __init__(self, user_agent: str, state_path: str = "data/seen_entries.json"):
+    CIK_MAP_URL = "https://www.sec.gov/files/company_tickers.json"
+    CIK_MAP_TTL_SECONDS = 24 * 60 * 60
+    # Backoff before retrying a failed map download, so an outage costs one request per window
+    CIK_MAP_RETRY_SECONDS = 5 * 60
+    MAX_SEEN_ENTRIES = 10_000
+    # Document links tried, in order, per filing; only failures fall through to the next.
+    MAX_DOCUMENT_CANDIDATES = 2
+
+    # Filer CIK appears in the entry link (".../edgar/data/1045810/..." or "CIK=...")
+    # and, zero-padded, in the title ("8-K - NVIDIA CORP (0001045810) (Filer)").
+    _LINK_CIK_RE = re.compile(r'(?:/data/|CIK=)(\d+)')
+    _TITLE_CIK_RE = re.compile(r'\((\d{10})\)')
+
+    def __init__(
+        self,
+        user_agent: str,
+        state_path: str = "data/seen_entries.json",
+        state_manager: Optional[StateManager] = None,
+        cik_map_path: str = "data/cik_map.json",
+    ):
         """
         SEC requires a User-Agent header (e.g., "MyCompany MyEmail@example.com")
+        If a StateManager is given, seen entries are persisted in its SQLite DB
+        instead of the JSON file at state_path.
         """
         self.headers = {"User-Agent": user_agent}
-        self.session = requests.Session()
-        self.seen_entries = set()
+        # One pooled HTTP/2 client: TLS is negotiated once and document fetches
+        # are multiplexed over the same connection.
+        self._client = httpx.Client(
+            headers=self.headers,
+            http2=True,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+            timeout=httpx.Timeout(12.0, connect=5.0),
+        )
+        # Bounded LRU of entry ids; values are unused
+        self.seen_entries: "OrderedDict[str, None]" = OrderedDict()
         self.state_path = state_path
+        self.state_manager = state_manager
+        self.cik_map_path = cik_map_path
+        self._cik_map: Optional[Dict[str, str]] = None
+        # Wall-clock time after which _cik_map is reloaded
+        self._cik_map_expires_at = 0.0
         self.etag: Optional[str] = None
         self.last_modified: Optional[str] = None
         self._load_seen_entries()
 
+    def close(self) -> None:
+        """Closes the underlying HTTP client."""
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
     def _load_seen_entries(self) -> None:
-        if not self.state_path:
+        if self.state_manager or not self.state_path:
             return
         if not os.path.exists(self.state_path):
             return
         try:
             with open(self.state_path, "r") as handle:
                 data = json.load(handle)
-                self.seen_entries = set(data)
+            for entry_id in data[-self.MAX_SEEN_ENTRIES:]:
+                self.seen_entries[entry_id] = None
         except Exception:
-            self.seen_entries = set()
+            self.seen_entries = OrderedDict()
 
-    def _persist_seen_entries(self) -> None:
+    def _persist_seen_entries(self, new_ids: List[str]) -> None:
+        if self.state_manager:
+            self.state_manager.mark_entries_seen(new_ids)
+            return
         if not self.state_path:
             return
         os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
         with open(self.state_path, "w") as handle:
-            json.dump(sorted(self.seen_entries), handle)
+            json.dump(list(self.seen_entries), handle)
+
+    def _remember(self, entry_id: str) -> None:
+        self.seen_entries[entry_id] = None
+        self.seen_entries.move_to_end(entry_id)
+        if len(self.seen_entries) > self.MAX_SEEN_ENTRIES:
+            self.seen_entries.popitem(last=False)
+
+    def _has_seen(self, entry_id: str) -> bool:
+        if entry_id in self.seen_entries:
+            self.seen_entries.move_to_end(entry_id)
+            return True
+        if self.state_manager and self.state_manager.has_seen_entry(entry_id):
+            self._remember(entry_id)
+            return True
+        return False
 
     def fetch_latest_filings(self) -> List[Dict]:
         """
         Fetches and parses the latest 8-K filings.
         """
-        request_headers = dict(self.headers)
+        import feedparser
+
+        request_headers = {}
         if self.etag:
             request_headers["If-None-Match"] = self.etag
         if self.last_modified:
             request_headers["If-Modified-Since"] = self.last_modified
 
-        response = self.session.get(self.RSS_URL, headers=request_headers)
+        with SEC_THROTTLE.acquire():
+            response = self._client.get(self.RSS_URL, headers=request_headers)
         if response.status_code == 304:
             return []
         if response.status_code != 200:
-            print(f"Error fetching SEC feed: {response.status_code}")
+            logger.warning("Error fetching SEC feed: %s", response.status_code)
             return []
 
         self.etag = response.headers.get("ETag", self.etag)
@@ -68,56 +140,165 @@ class SECPoller:
         new_filings = []
 
         for entry in feed.entries:
-            if entry.id not in self.seen_entries:
+            if not self._has_seen(entry.id):
                 filing = {
                     "id": entry.id,
                     "title": entry.title,
                     "link": entry.link,
                     "updated": entry.updated,
-                    "ticker": self._extract_ticker(entry.title)
+                    "ticker": self._extract_ticker(entry)
                 }
                 new_filings.append(filing)
-                self.seen_entries.add(entry.id)
+                self._remember(entry.id)
 
         if new_filings:
-            self._persist_seen_entries()
+            self._persist_seen_entries([filing["id"] for filing in new_filings])
 
         return new_filings
 
-    def _extract_ticker(self, title: str) -> Optional[str]:
+    def _load_cik_map(self) -> Dict[str, str]:
         """
-        Simple heuristic to extract ticker from SEC title.
-        Example title: "8-K - NVIDIA CORP (0001045810) (Filer)"
+        Loads SEC's CIK-to-ticker map, keyed by zero-padded CIK.
+        The map is cached on disk and refreshed once it is older than CIK_MAP_TTL_SECONDS.
+        If the refresh fails, the expired on-disk copy is used (or {} if there is none)
+        and the next attempt waits CIK_MAP_RETRY_SECONDS.
         """
+        path = self.cik_map_path
+        disk_map: Optional[Dict[str, str]] = None
+        if path and os.path.exists(path):
+            mtime = os.path.getmtime(path)
+            try:
+                with open(path, "r") as handle:
+                    disk_map = json.load(handle)
+            except Exception:
+                disk_map = None
+            if disk_map and time.time() - mtime < self.CIK_MAP_TTL_SECONDS:
+                self._cik_map_expires_at = mtime + self.CIK_MAP_TTL_SECONDS
+                return disk_map
+
+        cik_map: Dict[str, str] = {}
         try:
-            # This is a guestimate; in a real app we'd use a CIK-to-Ticker map
-            if "(" in title:
-                parts = title.split("(")
-                return parts[0].split("-")[-1].strip()
-        except:
-            pass
-        return None
+            with SEC_THROTTLE.acquire():
+                response = self._client.get(self.CIK_MAP_URL)
+            response.raise_for_status()
+            for row in response.json().values():
+                # Multi-class issuers list several tickers per CIK; the first is the primary listing
+                cik_map.setdefault(str(row["cik_str"]).zfill(10), row["ticker"])
+        except Exception as e:
+            logger.warning("Error loading CIK map: %s", e)
+            cik_map = {}
+        if not cik_map:
+            self._cik_map_expires_at = time.time() + self.CIK_MAP_RETRY_SECONDS
+            return disk_map or {}
+
+        self._cik_map_expires_at = time.time() + self.CIK_MAP_TTL_SECONDS
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as handle:
+                json.dump(cik_map, handle)
+        return cik_map
+
+    def _extract_ticker(self, entry) -> Optional[str]:
+        """
+        Resolves the filer's ticker via the CIK-to-ticker map.
+        Example title: "8-K - NVIDIA CORP (0001045810) (Filer)"
+        """
+        match = self._LINK_CIK_RE.search(getattr(entry, "link", "") or "")
+        if not match:
+            match = self._TITLE_CIK_RE.search(getattr(entry, "title", "") or "")
+        if not match:
+            return None
+        if time.time() >= self._cik_map_expires_at:
+            # A stale map beats no map while a failed refresh waits out its backoff
+            self._cik_map = self._load_cik_map() or self._cik_map
+        if not self._cik_map:
+            return None
+        return self._cik_map.get(match.group(1).zfill(10))
 
     def get_filing_text(self, entry_url: str) -> str:
         """
         Navigates to the SEC filing page and extracts the main text content.
+        Uses the pooled HTTP/2 client, so repeated calls reuse the same connection.
+        """
+        with SEC_THROTTLE.acquire():
+            response = self._client.get(entry_url)
+        for url in self._document_urls(response.content):
+            try:
+                text = self._stream_text(url)
+            except httpx.HTTPError as e:
+                logger.debug("Failed fetching %s: %s", url, e)
+                continue
+            if text:
+                return text
+        return ""
+
+    def _document_urls(self, index_page: bytes) -> List[str]:
         """
+        Returns up to MAX_DOCUMENT_CANDIDATES document links from a filing index page,
+        in page order. Callers try them one at a time and stop at the first that loads.
+        """
+        from bs4 import BeautifulSoup, SoupStrainer
+
         # Note: SEC pages are complex; this is a simplified version for V0
-        response = self.session.get(entry_url, headers=self.headers)
-        soup = BeautifulSoup(response.content, 'html.parser')
-        
+        # Only the links matter on the index page, so skip building the rest of the DOM
+        soup = BeautifulSoup(index_page, 'lxml', parse_only=SoupStrainer('a'))
+
         # Find the link to the actual .htm or .txt filing
         # Typically the first link in the 'Document' table
-        links = soup.find_all('a')
-        for link in links:
-            if '.htm' in link.get('href', '') and 'ix?doc=' not in link.get('href', ''):
-                doc_url = "https://www.sec.gov" + link.get('href')
-                doc_res = self.session.get(doc_url, headers=self.headers)
-                doc_soup = BeautifulSoup(doc_res.content, 'html.parser')
-                return doc_soup.get_text(separator='\n')
-        
-        return ""
+        candidate_urls: List[str] = []
+        for link in soup.find_all('a'):
+            href = link.get('href', '')
+            if '.htm' in href and 'ix?doc=' not in href:
+                doc_url = "https://www.sec.gov" + href
+                if doc_url not in candidate_urls:
+                    candidate_urls.append(doc_url)
+                if len(candidate_urls) == self.MAX_DOCUMENT_CANDIDATES:
+                    break
+        return candidate_urls
+
+    @staticmethod
+    def _text_parser(response: httpx.Response, head: bytes) -> etree.HTMLParser:
+        """
+        Builds a parser for the document's encoding. SEC Archives serve text/html without
+        a charset, so fall back to a <meta charset> in the first chunk, then to UTF-8
+        (lxml would otherwise assume Latin-1).
+        """
+        encoding = response.charset_encoding
+        if not encoding:
+            from bs4.dammit import EncodingDetector
+            encoding = EncodingDetector.find_declared_encoding(head, is_html=True)
+        try:
+            return etree.HTMLParser(encoding=encoding or "utf-8")
+        except LookupError:
+            return etree.HTMLParser(encoding="utf-8")
+
+    @staticmethod
+    def _parser_text(parser: Optional[etree.HTMLParser]) -> str:
+        if parser is None:
+            return ""
+        root = parser.close()
+        if root is None:
+            return ""
+        # Match BeautifulSoup's get_text(): CSS and JS are not filing text
+        etree.strip_elements(root, "script", "style", with_tail=False)
+        return "\n".join(root.itertext())
+
+    def _stream_text(self, url: str) -> str:
+        """
+        Streams an HTML document into an incremental lxml parser and returns its text.
+        Peak memory stays flat regardless of filing size (10-Ks often exceed 5 MB).
+        """
+        parser = None
+        with SEC_THROTTLE.acquire():
+            with self._client.stream("GET", url) as response:
+                response.raise_for_status()
+                for chunk in response.iter_bytes(8192):
+                    if parser is None:
+                        parser = self._text_parser(response, chunk)
+                    parser.feed(chunk)
+        return self._parser_text(parser)
 
 if __name__ == "__main__":
     # Example usage: poller = SECPoller("MyProject contact@example.com")
-    print("SEC Poller module defined. Strictly using Open Source libraries (feedparser, bs4).")
+    logging.basicConfig(level=logging.INFO)
+    logger.info("SEC Poller module defined. Strictly using Open Source libraries (feedparser, bs4).")
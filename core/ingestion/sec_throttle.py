@@ -0,0 +1,46 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class SECThrottler:
+    """
+    Process-wide token bucket for requests to www.sec.gov.
+    SEC's fair-access policy allows 10 requests/second per client; every
+    outbound call (EdgarClient, SECPoller) acquires a token first so that
+    concurrent workers share a single budget instead of tripping 403/429s.
+    """
+    def __init__(self, rate: float = 9.0, burst: int = 10):
+        if rate <= 0 or burst <= 0:
+            raise ValueError("rate and burst must be positive")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self) -> float:
+        """Takes a token if one is available; otherwise returns seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def wait(self) -> None:
+        """Blocks the calling thread until a token is available."""
+        delay = self._take()
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._take()
+
+    @contextmanager
+    def acquire(self):
+        self.wait()
+        yield
+
+
+SEC_THROTTLE = SECThrottler()
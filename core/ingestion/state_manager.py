@@ -1,24 +1,95 @@
+import logging
 import os
+import queue
 import sqlite3
-from typing import List, Optional
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Every repeated query is defined once here so all calls pass the same SQL text and
+# reuse the connection's compiled statement (stdlib sqlite3 keeps an LRU cache of
+# prepared statements keyed by SQL text, sized by _STATEMENT_CACHE_SIZE). This is the
+# closest stdlib equivalent of SQLITE_PREPARE_PERSISTENT; new queries should follow
+# the same pattern rather than building SQL strings inline.
+_SQL_IS_PROCESSED = 'SELECT 1 FROM processed_filings WHERE accession_number = ?'
+_SQL_MARK_PROCESSED = 'INSERT OR IGNORE INTO processed_filings (accession_number, ticker, filing_date) VALUES (?, ?, ?)'
+_SQL_PROCESSED_COUNT = "SELECT n FROM counters WHERE name = 'processed_filings'"
+_SQL_PROCESSED_ACCESSIONS = 'SELECT accession_number FROM processed_filings'
+_SQL_HAS_SEEN_ENTRY = 'SELECT 1 FROM seen_feed_entries WHERE entry_id = ?'
+_SQL_MARK_ENTRY_SEEN = 'INSERT OR IGNORE INTO seen_feed_entries (entry_id) VALUES (?)'
+_SQL_RECORD_SCHEDULER_EVENT = '''
+    INSERT INTO scheduler_events (
+        event_type,
+        job_id,
+        scheduled_run_time,
+        exception,
+        traceback
+    ) VALUES (?, ?, ?, ?, ?)
+'''
+_STATEMENT_CACHE_SIZE = 128
+# Bump when _migrate() changes; stored in the database's PRAGMA user_version
+_SCHEMA_VERSION = 2
+
+# Applied once per connection. WAL lets readers run alongside the writer and, with
+# synchronous=NORMAL, commits no longer fsync; busy_timeout waits out a concurrent
+# writer instead of failing with "database is locked".
+_CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA temp_store=MEMORY;",
+    "PRAGMA cache_size=-20000;",  # ~20 MB page cache
+    "PRAGMA mmap_size=268435456;",  # 256 MB
+    "PRAGMA busy_timeout=5000;",
+    "PRAGMA wal_autocheckpoint=1000;",
+)
 
 class StateManager:
     """
     Manages simple state persistence using SQLite to track processed filings.
     Prevents duplicate processing of the same 8-K.
+    Writes go through a single connection shared across threads and serialized by a
+    lock; reads use a small pool of read-only connections, which WAL lets run
+    alongside the writer.
     """
-    def __init__(self, db_path: str = "data/celestial.db"):
+    OPTIMIZE_INTERVAL_SECONDS = 900
+
+    def __init__(self, db_path: str = "data/celestial.db", readers: int = 2):
         self.db_path = db_path
         self.conn = None
+        self._readers: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._reader_count = readers
+        # Re-entrant so mark_* calls can run inside batch() on the same thread
+        self._lock = threading.RLock()
+        self._seen: Set[str] = set()
+        # Accessions cached during the open batch, dropped again if it rolls back
+        self._batch_seen: Optional[Set[str]] = None
+        self._last_optimize = time.monotonic()
         self._init_db()
 
     def _init_db(self):
         """Initializes the SQLite database with necessary tables."""
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path)
-        self.conn.execute("PRAGMA journal_mode=WAL;")
-        c = self.conn.cursor()
-        c.execute('''
+        self.conn = self._connect()
+        # Bound once so hot paths skip the explicit cursor() call and attribute lookup
+        self._exec = self.conn.execute
+        # Schema DDL only runs when the database predates _SCHEMA_VERSION, so reopening
+        # an up-to-date database costs a single PRAGMA read.
+        if self._exec('PRAGMA user_version').fetchone()[0] < _SCHEMA_VERSION:
+            with self.batch():
+                self._migrate()
+        # Processed accessions only ever grow, so keep them in memory for O(1) lookups.
+        self._seen = {row[0] for row in self._exec(_SQL_PROCESSED_ACCESSIONS)}
+
+        # Readers are opened after the schema exists
+        for _ in range(self._reader_count):
+            self._readers.put(self._connect(read_only=True))
+
+    def _migrate(self) -> None:
+        """Creates missing tables and indexes and stamps the schema version."""
+        self._exec('''
             CREATE TABLE IF NOT EXISTS processed_filings (
                 accession_number TEXT PRIMARY KEY,
                 ticker TEXT,
@@ -26,7 +97,7 @@ class StateManager:
                 processed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        c.execute('''
+        self._exec('''
             CREATE TABLE IF NOT EXISTS scheduler_events (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 event_type TEXT NOT NULL,
@@ -37,39 +108,221 @@ class StateManager:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         ''')
-        self.conn.commit()
+        self._exec('''
+            CREATE TABLE IF NOT EXISTS seen_feed_entries (
+                entry_id TEXT PRIMARY KEY,
+                seen_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        self._exec('CREATE INDEX IF NOT EXISTS idx_processed_filings_ticker ON processed_filings(ticker)')
+        # v2: row counts maintained by triggers, since COUNT(*) scans the whole table
+        self._exec('''
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                n INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        self._exec(
+            "INSERT OR IGNORE INTO counters (name, n) "
+            "SELECT 'processed_filings', COUNT(*) FROM processed_filings"
+        )
+        self._exec('''
+            CREATE TRIGGER IF NOT EXISTS trg_processed_filings_ai AFTER INSERT ON processed_filings
+            BEGIN
+                UPDATE counters SET n = n + 1 WHERE name = 'processed_filings';
+            END
+        ''')
+        self._exec('''
+            CREATE TRIGGER IF NOT EXISTS trg_processed_filings_ad AFTER DELETE ON processed_filings
+            BEGIN
+                UPDATE counters SET n = n - 1 WHERE name = 'processed_filings';
+            END
+        ''')
+        self._exec(f'PRAGMA user_version = {_SCHEMA_VERSION}')
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        # Autocommit mode: each statement commits on its own unless wrapped in an
+        # explicit BEGIN, so there is no implicit transaction left open between calls.
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            isolation_level=None,
+            cached_statements=_STATEMENT_CACHE_SIZE,
+        )
+        for pragma in _CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only=ON;")
+        return conn
+
+    @contextmanager
+    def _reader(self):
+        """Checks out a read-only connection; falls back to the writer when none are pooled."""
+        if not self._reader_count:
+            with self._lock:
+                yield self.conn
+            return
+        conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
 
     def close(self):
-        """Closes the SQLite connection."""
-        if self.conn:
-            self.conn.close()
-            self.conn = None
+        """Closes the SQLite connections, refreshing query-planner statistics first."""
+        for _ in range(self._reader_count):
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        self._reader_count = 0
+        with self._lock:
+            if self.conn:
+                try:
+                    self.conn.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
+                self.conn.close()
+                self.conn = None
+
+    def maybe_optimize(self) -> None:
+        """
+        Runs PRAGMA optimize at most once per OPTIMIZE_INTERVAL_SECONDS so long-running
+        pollers keep table statistics current as processed_filings grows.
+        """
+        if time.monotonic() - self._last_optimize < self.OPTIMIZE_INTERVAL_SECONDS:
+            return
+        with self._lock:
+            self.conn.execute("PRAGMA optimize")
+            self._last_optimize = time.monotonic()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups writes into a single transaction that commits once on exit:
+
+            with state.batch():
+                state.mark_processed(...)
+                state.mark_processed(...)
+
+        Other threads wait until the batch finishes. Nested batches join the outer one.
+        """
+        with self._lock:
+            if self.conn.in_transaction:
+                yield self
+                return
+            self.conn.execute('BEGIN IMMEDIATE')
+            self._batch_seen = set()
+            try:
+                yield self
+                # A failed COMMIT (e.g. a deferred constraint) must not leave the
+                # transaction open, or every later batch would join it as "nested".
+                self.conn.execute('COMMIT')
+            except BaseException:
+                if self.conn.in_transaction:
+                    self.conn.execute('ROLLBACK')
+                self._seen -= self._batch_seen
+                raise
+            finally:
+                self._batch_seen = None
+
+    def _remember_processed(self, accession_numbers: Iterable[str]) -> None:
+        accession_numbers = set(accession_numbers)
+        self._seen |= accession_numbers
+        if self._batch_seen is not None:
+            self._batch_seen |= accession_numbers
 
     def is_processed(self, accession_number: str) -> bool:
-        """Checks if a filing has already been processed."""
-        c = self.conn.cursor()
-        c.execute('SELECT 1 FROM processed_filings WHERE accession_number = ?', (accession_number,))
-        result = c.fetchone()
+        """
+        Checks if a filing has already been processed.
+        Answers from the in-memory cache; only unseen accessions fall through to
+        SQLite, which picks up rows written by other StateManager instances.
+        """
+        if accession_number in self._seen:
+            return True
+        with self._reader() as conn:
+            result = conn.execute(_SQL_IS_PROCESSED, (accession_number,)).fetchone()
+        if result is not None:
+            with self._lock:
+                self._remember_processed((accession_number,))
         return result is not None
 
-    def mark_processed(self, accession_number: str, ticker: str, filing_date: str):
-        """Marks a filing as processed."""
-        c = self.conn.cursor()
-        try:
-            c.execute(
-                'INSERT OR IGNORE INTO processed_filings (accession_number, ticker, filing_date) VALUES (?, ?, ?)',
-                (accession_number, ticker, filing_date)
-            )
-            self.conn.commit()
-        except Exception as e:
-            print(f"Error marking state: {e}")
+    def mark_processed(self, accession_number: str, ticker: str, filing_date: str) -> bool:
+        """
+        Marks a filing as processed. Returns False if the write failed, or re-raises
+        inside an enclosing batch() (see mark_processed_bulk).
+        """
+        with self._lock:
+            nested = self.conn.in_transaction
+            try:
+                self._exec(_SQL_MARK_PROCESSED, (accession_number, ticker, filing_date))
+            except sqlite3.Error:
+                if nested:
+                    raise
+                logger.exception("Error marking %s as processed", accession_number)
+                return False
+            self._remember_processed((accession_number,))
+        return True
+
+    def mark_processed_bulk(self, rows: Iterable[Tuple[str, str, str]]) -> bool:
+        """
+        Marks many filings as processed in a single transaction.
+        rows: (accession_number, ticker, filing_date) tuples.
+        Returns False (and writes nothing) if the transaction failed. Inside an
+        enclosing batch() the error is re-raised instead, so the outer batch rolls back.
+        """
+        rows = list(rows)
+        if not rows:
+            return True
+        with self._lock:
+            nested = self.conn.in_transaction
+            try:
+                with self.batch():
+                    self.conn.executemany(_SQL_MARK_PROCESSED, rows)
+                    self._remember_processed(row[0] for row in rows)
+            except sqlite3.Error:
+                if nested:
+                    raise
+                logger.exception("Error marking %d filings as processed", len(rows))
+                return False
+        return True
+
+    def has_seen_entry(self, entry_id: str) -> bool:
+        """Checks if a feed entry (e.g., an SEC Atom entry id) has been seen before."""
+        with self._reader() as conn:
+            result = conn.execute(_SQL_HAS_SEEN_ENTRY, (entry_id,)).fetchone()
+        return result is not None
+
+    def mark_entries_seen(self, entry_ids: Iterable[str]) -> bool:
+        """
+        Records feed entries as seen in a single transaction. Returns False on failure,
+        or re-raises inside an enclosing batch() (see mark_processed_bulk).
+        """
+        rows = [(entry_id,) for entry_id in entry_ids]
+        if not rows:
+            return True
+        with self._lock:
+            nested = self.conn.in_transaction
+            try:
+                with self.batch():
+                    self.conn.executemany(_SQL_MARK_ENTRY_SEEN, rows)
+            except sqlite3.Error:
+                if nested:
+                    raise
+                logger.exception("Error marking %d feed entries as seen", len(rows))
+                return False
+        return True
 
     def get_processed_count(self) -> int:
         """Returns the total number of processed filings."""
-        c = self.conn.cursor()
-        c.execute('SELECT COUNT(*) FROM processed_filings')
-        count = c.fetchone()[0]
-        return count
+        with self._reader() as conn:
+            return conn.execute(_SQL_PROCESSED_COUNT).fetchone()[0]
 
     def record_scheduler_event(
         self,
@@ -80,20 +333,51 @@ class StateManager:
         traceback: Optional[str],
     ) -> None:
         """Records scheduler event metadata for later inspection."""
-        c = self.conn.cursor()
+        with self._lock:
+            try:
+                self._exec(
+                    _SQL_RECORD_SCHEDULER_EVENT,
+                    (event_type, job_id, scheduled_run_time, exception, traceback),
+                )
+            except sqlite3.Error:
+                logger.exception("Error recording scheduler event %s", event_type)
+
+
+class StateManagerPool:
+    """
+    Fixed-size pool of pre-initialized StateManagers for callers that want a
+    manager per worker without paying connection setup (PRAGMAs, schema check,
+    cache warm-up) on every checkout:
+
+        pool = StateManagerPool(db_path, size=4)
+        with pool.acquire() as state:
+            state.mark_processed(...)
+
+    A single StateManager is already thread-safe, so PollingEngine shares one;
+    the pool is for callers that want independent writer connections.
+    """
+
+    def __init__(self, db_path: str = "data/celestial.db", size: int = 8, readers: int = 0):
+        if size <= 0:
+            raise ValueError("size must be positive")
+        self.size = size
+        self._q: "queue.Queue[StateManager]" = queue.Queue()
+        for _ in range(size):
+            self._q.put(StateManager(db_path, readers=readers))
+
+    @contextmanager
+    def acquire(self):
+        """Checks out a StateManager, blocking until one is free, and returns it on exit."""
+        state = self._q.get()
         try:
-            c.execute(
-                '''
-                INSERT INTO scheduler_events (
-                    event_type,
-                    job_id,
-                    scheduled_run_time,
-                    exception,
-                    traceback
-                ) VALUES (?, ?, ?, ?, ?)
-                ''',
-                (event_type, job_id, scheduled_run_time, exception, traceback),
-            )
-            self.conn.commit()
-        except Exception as e:
-            print(f"Error recording scheduler event: {e}")
+            yield state
+        finally:
+            self._q.put(state)
+
+    def close(self):
+        """Closes every pooled StateManager that is currently checked in."""
+        while True:
+            try:
+                self._q.get_nowait().close()
+            except queue.Empty:
+                break
@@ -1,11 +1,14 @@
 # Test script for Hybrid RAG search
+import sys
 from core.synthesis.hybrid_rag import HybridRAGEngine
 
 engine = HybridRAGEngine()
 results = engine.search("Microsoft cloud revenue", top_k=5)
 
+lines = []
 for i, r in enumerate(results):
-    ticker = r["metadata"]["ticker"]
-    topic = r["metadata"]["topic"]
+    metadata = r["metadata"]
     text_preview = r["text"][:120].replace("\n", " ")
-    print(f"{i+1}. {ticker} - {topic}: {text_preview}...")
+    lines.append(f"{i+1}. {metadata['ticker']} - {metadata['topic']}: {text_preview}...")
+if lines:
+    sys.stdout.write("\n".join(lines) + "\n")
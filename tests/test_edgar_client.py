@@ -0,0 +1,86 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import httpx
+
+from core.ingestion.edgar_client import EdgarClient
+
+
+def _make_filing(accession):
+    filing = MagicMock()
+    filing.accession_no = accession
+    filing.filing_date = "2026-01-01"
+    filing.form = "8-K"
+    filing.url = f"https://www.sec.gov/{accession}"
+    return filing
+
+
+class TestEdgarClient(unittest.TestCase):
+
+    @patch('edgar.Company')
+    def test_get_latest_filings_keeps_ticker_order(self, mock_company):
+        def company_for(ticker):
+            company = MagicMock()
+            company.get_filings.return_value.latest.return_value = [_make_filing(f"{ticker}-1")]
+            return company
+        mock_company.side_effect = company_for
+
+        client = EdgarClient()
+        filings = client.get_latest_filings(["NVDA", "AMD", "INTC"], limit=1)
+
+        self.assertEqual([f['ticker'] for f in filings], ["NVDA", "AMD", "INTC"])
+        self.assertEqual(filings[1]['accession_number'], "AMD-1")
+
+    @patch('edgar.Company')
+    def test_get_latest_filings_skips_failed_ticker(self, mock_company):
+        def company_for(ticker):
+            if ticker == "BAD":
+                raise httpx.ConnectError("boom")
+            company = MagicMock()
+            company.get_filings.return_value.latest.return_value = _make_filing(f"{ticker}-1")
+            return company
+        mock_company.side_effect = company_for
+
+        client = EdgarClient()
+        filings = client.get_latest_filings(["BAD", "NVDA"], limit=1)
+
+        self.assertEqual(len(filings), 1)
+        self.assertEqual(filings[0]['ticker'], "NVDA")
+
+    def _filing_with_exhibit(self):
+        exhibit = SimpleNamespace(description="Press Release", document="ex99-1.htm",
+                                  markdown=lambda: "Record quarter.")
+        other = SimpleNamespace(description="EX-99.2", document="ex99-2.htm",
+                                markdown=MagicMock(return_value="Slides."))
+        filing = SimpleNamespace(form="8-K", markdown=MagicMock(return_value="Cover page."),
+                                 attachments=[other, exhibit])
+        return filing, other
+
+    def test_get_filing_text_uses_press_release_only(self):
+        filing, other = self._filing_with_exhibit()
+
+        text = EdgarClient().get_filing_text(filing)
+
+        self.assertIn("--- EXHIBIT 99.1 (PRESS RELEASE) ---\nRecord quarter.", text)
+        self.assertNotIn("Cover page.", text)
+        filing.markdown.assert_not_called()
+        other.markdown.assert_not_called()
+
+    def test_get_filing_text_can_include_main_filing(self):
+        filing, _ = self._filing_with_exhibit()
+
+        text = EdgarClient(include_main_when_exhibit_present=True).get_filing_text(filing)
+
+        self.assertIn("Cover page.", text)
+        self.assertIn("Record quarter.", text)
+
+    def test_get_filing_text_falls_back_to_main_filing(self):
+        filing = SimpleNamespace(form="8-K", markdown=lambda: "Item 5.02 departure.", attachments=[])
+
+        text = EdgarClient().get_filing_text(filing)
+
+        self.assertEqual(text, "--- MAIN FILING (FORM 8-K) ---\nItem 5.02 departure.")
+
+if __name__ == '__main__':
+    unittest.main()
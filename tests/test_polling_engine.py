@@ -0,0 +1,119 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+import types
+import unittest
+from unittest.mock import MagicMock, patch
+
+from core.ingestion.polling_engine import PollingEngine
+from core.ingestion.state_manager import StateManager
+
+
+def _filing(ticker, accession):
+    return {
+        "ticker": ticker,
+        "accession_number": accession,
+        "filing_date": "2026-01-01",
+        "form": "8-K",
+        "url": "",
+        "filing_obj": MagicMock(),
+    }
+
+
+class TestPollingEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, "state.db")
+        patchers = [
+            patch('core.ingestion.polling_engine.MarketRegistry'),
+            patch('core.ingestion.polling_engine.ExtractionEngine'),
+            patch('core.ingestion.polling_engine.StateManager', side_effect=lambda: StateManager(db_path)),
+        ]
+        self.mock_registry = patchers[0].start()
+        patchers[1].start()
+        patchers[2].start()
+        for p in patchers:
+            self.addCleanup(p.stop)
+
+        self.client = MagicMock()
+        self.client.get_filing_text.return_value = "Revenue grew."
+        registry = self.mock_registry.return_value
+        registry.group_tickers_by_market.return_value = {"edgar": ["NVDA", "AMD"], "nse": []}
+        registry.get_client.return_value = self.client
+
+        self.engine = PollingEngine(tickers=["NVDA", "AMD"], max_workers=2)
+        self.engine._save_report = MagicMock()
+        self.engine._index_report = MagicMock()
+
+    def tearDown(self):
+        self.engine.state.close()
+        self.tmpdir.cleanup()
+
+    def test_run_once_marks_new_filings(self):
+        self.client.get_latest_filings.return_value = [_filing("NVDA", "0001"), _filing("AMD", "0002")]
+
+        self.engine.run_once()
+
+        self.assertTrue(self.engine.state.is_processed("0001"))
+        self.assertTrue(self.engine.state.is_processed("0002"))
+        self.assertEqual(self.engine._save_report.call_count, 2)
+        self.assertEqual(self.engine._pending_marks, {})
+
+    def test_run_once_skips_processed_filings(self):
+        self.engine.state.mark_processed("0001", "NVDA", "2026-01-01")
+        self.client.get_latest_filings.return_value = [_filing("NVDA", "0001"), _filing("AMD", "0002")]
+
+        self.engine.run_once()
+
+        self.assertEqual(self.engine._save_report.call_count, 1)
+        self.assertEqual(self.engine.state.get_processed_count(), 2)
+
+    def test_run_once_processes_duplicate_accession_once(self):
+        self.client.get_latest_filings.return_value = [_filing("NVDA", "0001"), _filing("NVDA", "0001")]
+
+        self.engine.run_once()
+
+        self.assertEqual(self.client.get_filing_text.call_count, 1)
+
+    def test_failed_flush_keeps_filing_pending_without_reprocessing(self):
+        self.client.get_latest_filings.return_value = [_filing("NVDA", "0001")]
+        self.engine.state.mark_processed_bulk = MagicMock(return_value=False)
+
+        for _ in range(3):
+            self.engine.run_once()
+
+        self.assertEqual(self.client.get_filing_text.call_count, 1)
+        self.assertEqual(list(self.engine._pending_marks), ["0001"])
+
+    def test_get_rag_builds_one_engine_across_threads(self):
+        def slow_engine():
+            time.sleep(0.05)
+            return MagicMock()
+
+        fake_module = types.ModuleType("core.synthesis.hybrid_rag")
+        fake_module.HybridRAGEngine = MagicMock(side_effect=slow_engine)
+        with patch.dict(sys.modules, {"core.synthesis.hybrid_rag": fake_module}):
+            threads = [threading.Thread(target=self.engine._get_rag) for _ in range(4)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+
+        fake_module.HybridRAGEngine.assert_called_once_with()
+
+    @patch('core.ingestion.polling_engine.time')
+    def test_start_loop_sleeps_until_next_deadline(self, mock_time):
+        # Cycle starts at t=0 and takes 8s; the next one should start at t=60.
+        mock_time.monotonic.side_effect = [0.0, 8.0]
+        mock_time.sleep.side_effect = KeyboardInterrupt
+        self.engine.run_once = MagicMock()
+
+        self.engine.start_loop(interval_seconds=60)
+
+        mock_time.sleep.assert_called_once_with(52.0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+import os
+import tempfile
+import unittest
+
+import httpx
+
+from core.ingestion.sec_polling import SECPoller
+from core.ingestion.state_manager import StateManager
+
+ATOM_FEED = b"""<?xml version="1.0" encoding="ISO-8859-1" ?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+<title>Latest Filings</title>
+<entry>
+<title>8-K - NVIDIA CORP (0001045810) (Filer)</title>
+<link rel="alternate" type="text/html" href="https://www.sec.gov/Archives/edgar/data/1045810/000104581026000001/0001045810-26-000001-index.htm"/>
+<updated>2026-01-01T16:05:00-05:00</updated>
+<id>urn:tag:sec.gov,2008:accession-number=0001045810-26-000001</id>
+</entry>
+</feed>
+"""
+
+
+INDEX_PAGE = b"""<html><body><table>
+<tr><td><a href="/ix?doc=/Archives/edgar/data/1045810/000104581026000001/nvda-8k.htm">nvda-8k.htm</a></td></tr>
+<tr><td><a href="/Archives/edgar/data/1045810/000104581026000001/missing.htm">missing.htm</a></td></tr>
+<tr><td><a href="/Archives/edgar/data/1045810/000104581026000001/nvda-8k.htm">nvda-8k.htm</a></td></tr>
+</table></body></html>"""
+
+# First candidate loads, so the exhibit after it should never be downloaded
+SINGLE_FETCH_INDEX_PAGE = b"""<html><body><table>
+<tr><td><a href="/Archives/edgar/data/1045810/000104581026000002/nvda-8k.htm">nvda-8k.htm</a></td></tr>
+<tr><td><a href="/Archives/edgar/data/1045810/000104581026000002/ex99.htm">ex99.htm</a></td></tr>
+</table></body></html>"""
+
+# Legacy filing that declares its charset only in a meta tag (served without one)
+CP1252_DOCUMENT = (
+    b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1252"></head>'
+    b"<body><p>Company\x92s revenue grew\xa0 12%</p></body></html>"
+)
+
+COMPANY_TICKERS = {
+    "0": {"cik_str": 1045810, "ticker": "NVDA", "title": "NVIDIA CORP"},
+    "1": {"cik_str": 1652044, "ticker": "GOOGL", "title": "Alphabet Inc."},
+    "2": {"cik_str": 1652044, "ticker": "GOOG", "title": "Alphabet Inc."},
+}
+
+DOCUMENT = b"<html><body><p>NVIDIA reports record revenue.</p></body></html>"
+
+# UTF-8 without a charset meta, plus markup whose contents must not leak into the text
+STYLED_DOCUMENT = (
+    "<html><head><style>p { color: red; }</style></head><body>"
+    "<script>var x = 1;</script><p>Revenue up 12% — to €5.2 billion</p>"
+    "</body></html>"
+).encode("utf-8")
+
+
+class TestSECPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.requests = []
+        self.cik_map_status = 200
+        self.poller = SECPoller(
+            "Test contact@example.com",
+            state_path=os.path.join(self.tmpdir.name, "seen_entries.json"),
+            cik_map_path=os.path.join(self.tmpdir.name, "cik_map.json"),
+        )
+        self.poller._client = httpx.Client(
+            headers=self.poller.headers,
+            transport=httpx.MockTransport(self._handle),
+        )
+
+    def tearDown(self):
+        self.poller.close()
+        self.tmpdir.cleanup()
+
+    def _handle(self, request):
+        self.requests.append(request)
+        if request.headers.get("If-None-Match") == '"v1"':
+            return httpx.Response(304)
+        if request.url.path.endswith("company_tickers.json"):
+            return httpx.Response(self.cik_map_status, json=COMPANY_TICKERS)
+        if request.url.path.endswith("000104581026000002-index.htm"):
+            return httpx.Response(200, content=SINGLE_FETCH_INDEX_PAGE)
+        if request.url.path.endswith("-index.htm"):
+            return httpx.Response(200, content=INDEX_PAGE)
+        if request.url.path.endswith("missing.htm"):
+            return httpx.Response(404)
+        if request.url.path.endswith("styled.htm"):
+            return httpx.Response(200, content=STYLED_DOCUMENT)
+        if request.url.path.endswith("cp1252.htm"):
+            return httpx.Response(200, content=CP1252_DOCUMENT)
+        if request.url.path.endswith("blank.htm"):
+            return httpx.Response(200, content=b"   ")
+        if request.url.path.endswith(".htm"):
+            return httpx.Response(200, content=DOCUMENT)
+        return httpx.Response(200, content=ATOM_FEED, headers={"ETag": '"v1"'})
+
+    def test_fetch_latest_filings_returns_only_new_entries(self):
+        filings = self.poller.fetch_latest_filings()
+        self.assertEqual(len(filings), 1)
+        self.assertEqual(filings[0]["title"], "8-K - NVIDIA CORP (0001045810) (Filer)")
+        self.assertEqual(filings[0]["ticker"], "NVDA")
+        self.assertEqual(self.requests[0].headers["User-Agent"], "Test contact@example.com")
+
+        self.assertEqual(self.poller.fetch_latest_filings(), [])
+
+    def test_unchanged_feed_short_circuits_on_304(self):
+        self.poller.fetch_latest_filings()
+        self.poller.seen_entries.clear()
+
+        self.assertEqual(self.poller.fetch_latest_filings(), [])
+        self.assertEqual(self.requests[-1].headers["If-None-Match"], '"v1"')
+
+    def test_seen_entries_persist_in_state_manager(self):
+        state = StateManager(os.path.join(self.tmpdir.name, "state.db"))
+        self.addCleanup(state.close)
+        self.poller.state_manager = state
+        self.assertEqual(len(self.poller.fetch_latest_filings()), 1)
+
+        restarted = SECPoller("Test contact@example.com", state_manager=state,
+                              cik_map_path=self.poller.cik_map_path)
+        restarted._client = httpx.Client(transport=httpx.MockTransport(self._handle))
+        self.addCleanup(restarted.close)
+        self.assertEqual(restarted.fetch_latest_filings(), [])
+
+    def test_seen_entries_are_bounded(self):
+        self.poller.MAX_SEEN_ENTRIES = 2
+        for entry_id in ("a", "b", "c"):
+            self.poller._remember(entry_id)
+        self.assertEqual(list(self.poller.seen_entries), ["b", "c"])
+
+    def test_cik_map_is_cached_on_disk(self):
+        self.poller.fetch_latest_filings()
+        self.assertTrue(os.path.exists(self.poller.cik_map_path))
+
+        self.poller._cik_map = None
+        self.requests.clear()
+        self.assertEqual(self.poller._load_cik_map(), {"0001045810": "NVDA", "0001652044": "GOOGL"})
+        self.assertEqual(self.requests, [])
+
+    def _cik_map_requests(self):
+        return [r for r in self.requests if r.url.path.endswith("company_tickers.json")]
+
+    def test_failed_cik_map_load_backs_off_then_retries(self):
+        entry = type("Entry", (), {"link": "https://www.sec.gov/Archives/edgar/data/1045810/x-index.htm"})()
+        self.cik_map_status = 403
+        for _ in range(3):
+            self.assertIsNone(self.poller._extract_ticker(entry))
+        self.assertEqual(len(self._cik_map_requests()), 1)
+
+        self.cik_map_status = 200
+        self.poller._cik_map_expires_at = 0.0  # backoff elapsed
+        self.assertEqual(self.poller._extract_ticker(entry), "NVDA")
+        self.assertEqual(len(self._cik_map_requests()), 2)
+
+    def test_failed_refresh_falls_back_to_expired_disk_map(self):
+        entry = type("Entry", (), {"link": "https://www.sec.gov/Archives/edgar/data/1045810/x-index.htm"})()
+        self.assertEqual(self.poller._extract_ticker(entry), "NVDA")
+
+        restarted = SECPoller("Test contact@example.com", state_path=None,
+                              cik_map_path=self.poller.cik_map_path)
+        restarted._client = httpx.Client(transport=httpx.MockTransport(self._handle))
+        self.addCleanup(restarted.close)
+        os.utime(self.poller.cik_map_path, (0, 0))
+        self.cik_map_status = 503
+        self.assertEqual(restarted._extract_ticker(entry), "NVDA")
+
+    def test_cik_map_is_refreshed_after_ttl(self):
+        entry = type("Entry", (), {"link": "https://www.sec.gov/Archives/edgar/data/1045810/x-index.htm"})()
+        self.assertEqual(self.poller._extract_ticker(entry), "NVDA")
+        fetches = len(self.requests)
+
+        self.poller._cik_map_expires_at = 0.0
+        os.utime(self.poller.cik_map_path, (0, 0))
+        self.assertEqual(self.poller._extract_ticker(entry), "NVDA")
+        self.assertEqual(len(self.requests), fetches + 1)
+
+    def test_get_filing_text_returns_first_document_that_loads(self):
+        text = self.poller.get_filing_text(
+            "https://www.sec.gov/Archives/edgar/data/1045810/000104581026000001/0001045810-26-000001-index.htm"
+        )
+        self.assertIn("NVIDIA reports record revenue.", text)
+        fetched = {request.url.path for request in self.requests}
+        self.assertIn("/Archives/edgar/data/1045810/000104581026000001/missing.htm", fetched)
+        self.assertIn("/Archives/edgar/data/1045810/000104581026000001/nvda-8k.htm", fetched)
+
+    def test_get_filing_text_stops_at_first_document_that_loads(self):
+        url = "https://www.sec.gov/Archives/edgar/data/1045810/000104581026000002/000104581026000002-index.htm"
+        self.assertIn("NVIDIA reports record revenue.", self.poller.get_filing_text(url))
+        fetched = [request.url.path for request in self.requests]
+        self.assertNotIn("/Archives/edgar/data/1045810/000104581026000002/ex99.htm", fetched)
+
+    def test_stream_text_decodes_utf8_and_drops_script_and_style(self):
+        text = self.poller._stream_text("https://www.sec.gov/Archives/styled.htm")
+        self.assertIn("Revenue up 12% — to €5.2 billion", text)
+        self.assertNotIn("color", text)
+        self.assertNotIn("var x", text)
+
+        self.assertEqual(self.poller._stream_text("https://www.sec.gov/Archives/blank.htm"), "")
+
+    def test_stream_text_honours_meta_charset(self):
+        text = self.poller._stream_text("https://www.sec.gov/Archives/cp1252.htm")
+        self.assertIn("Company\u2019s revenue grew\xa0 12%", text)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import time
+import unittest
+
+from core.ingestion.sec_throttle import SECThrottler
+
+
+class TestSECThrottler(unittest.TestCase):
+
+    def test_burst_is_immediate_then_throttled(self):
+        throttler = SECThrottler(rate=20, burst=2)
+        start = time.monotonic()
+        for _ in range(2):
+            with throttler.acquire():
+                pass
+        self.assertLess(time.monotonic() - start, 0.02)
+
+        with throttler.acquire():
+            pass
+        self.assertGreaterEqual(time.monotonic() - start, 0.04)
+
+    def test_rejects_non_positive_rate(self):
+        with self.assertRaises(ValueError):
+            SECThrottler(rate=0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from core.ingestion.state_manager import StateManager, StateManagerPool
+
+
+class TestStateManager(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "state.db")
+        self.state = StateManager(self.db_path)
+
+    def tearDown(self):
+        self.state.close()
+        self.tmpdir.cleanup()
+
+    def test_mark_and_check_processed(self):
+        self.assertFalse(self.state.is_processed("0001"))
+        self.state.mark_processed("0001", "NVDA", "2026-01-01")
+        self.assertTrue(self.state.is_processed("0001"))
+        self.assertEqual(self.state.get_processed_count(), 1)
+
+    def test_state_survives_reopen(self):
+        self.state.mark_processed("0001", "NVDA", "2026-01-01")
+        self.state.close()
+
+        self.state = StateManager(self.db_path)
+        self.assertTrue(self.state.is_processed("0001"))
+
+    def test_mark_processed_bulk(self):
+        rows = [("0001", "NVDA", "2026-01-01"), ("0002", "AMD", "2026-01-02"), ("0001", "NVDA", "2026-01-01")]
+        self.state.mark_processed_bulk(rows)
+
+        self.assertTrue(self.state.is_processed("0002"))
+        self.assertEqual(self.state.get_processed_count(), 2)
+        self.assertFalse(self.state.conn.in_transaction)
+
+    def test_mark_processed_bulk_reports_failure(self):
+        self.state.conn.execute("DROP TABLE processed_filings")
+
+        with self.assertLogs("core.ingestion.state_manager", level="ERROR"):
+            ok = self.state.mark_processed_bulk([("0001", "NVDA", "2026-01-01")])
+
+        self.assertFalse(ok)
+        self.assertNotIn("0001", self.state._seen)
+
+    def test_batch_commits_once_on_exit(self):
+        with self.state.batch():
+            self.state.mark_processed("0001", "NVDA", "2026-01-01")
+            self.state.mark_processed_bulk([("0002", "AMD", "2026-01-02")])
+            self.assertTrue(self.state.conn.in_transaction)
+
+        self.assertFalse(self.state.conn.in_transaction)
+        self.assertEqual(self.state.get_processed_count(), 2)
+
+    def test_batch_rolls_back_on_error(self):
+        with self.assertRaises(RuntimeError):
+            with self.state.batch():
+                self.state.mark_processed("0001", "NVDA", "2026-01-01")
+                raise RuntimeError("boom")
+
+        self.assertFalse(self.state.is_processed("0001"))
+        self.assertEqual(self.state.get_processed_count(), 0)
+
+    def test_batch_rolls_back_when_commit_fails(self):
+        conn = self.state.conn
+        conn.execute("PRAGMA foreign_keys=ON")
+        conn.execute("CREATE TABLE parent (id INTEGER PRIMARY KEY)")
+        conn.execute(
+            "CREATE TABLE child (parent_id INTEGER REFERENCES parent(id) DEFERRABLE INITIALLY DEFERRED)"
+        )
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            with self.state.batch():
+                self.state.mark_processed("0001", "NVDA", "2026-01-01")
+                conn.execute("INSERT INTO child (parent_id) VALUES (42)")
+
+        self.assertFalse(conn.in_transaction)
+        self.assertFalse(self.state.is_processed("0001"))
+        self.assertTrue(self.state.mark_processed_bulk([("0002", "AMD", "2026-01-02")]))
+        self.assertEqual(self.state.get_processed_count(), 1)
+
+    def test_mark_processed_bulk_reraises_inside_batch(self):
+        self.state.conn.execute("DROP TABLE processed_filings")
+
+        with self.assertRaises(sqlite3.Error):
+            with self.state.batch():
+                self.state.mark_processed_bulk([("0001", "NVDA", "2026-01-01")])
+
+        self.assertFalse(self.state.conn.in_transaction)
+
+    def test_mark_processed_reraises_inside_batch(self):
+        self.state.conn.execute(
+            "CREATE TRIGGER reject_0002 BEFORE INSERT ON processed_filings "
+            "WHEN NEW.accession_number = '0002' BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        )
+
+        with self.assertRaises(sqlite3.Error):
+            with self.state.batch():
+                self.state.mark_processed("0001", "NVDA", "2026-01-01")
+                self.state.mark_processed("0002", "AMD", "2026-01-02")
+
+        self.assertFalse(self.state.conn.in_transaction)
+        self.assertFalse(self.state.is_processed("0001"))
+        self.assertEqual(self.state.get_processed_count(), 0)
+
+    def test_maybe_optimize_is_rate_limited(self):
+        last = self.state._last_optimize
+        self.state.maybe_optimize()
+        self.assertEqual(self.state._last_optimize, last)
+
+        self.state._last_optimize -= StateManager.OPTIMIZE_INTERVAL_SECONDS
+        self.state.maybe_optimize()
+        self.assertGreater(self.state._last_optimize, last)
+
+    def test_reads_use_read_only_connections(self):
+        self.state.mark_processed("0001", "NVDA", "2026-01-01")
+        with self.state._reader() as conn:
+            self.assertIsNot(conn, self.state.conn)
+            self.assertEqual(conn.execute("PRAGMA query_only").fetchone()[0], 1)
+            self.assertIsNotNone(conn.execute("SELECT 1 FROM processed_filings").fetchone())
+
+    def test_record_scheduler_event(self):
+        self.state.record_scheduler_event("misfire", "polling_job", "2026-01-01T00:00:00", None, None)
+        row = self.state.conn.execute("SELECT event_type, job_id FROM scheduler_events").fetchone()
+        self.assertEqual(row, ("misfire", "polling_job"))
+
+    def test_sees_rows_written_by_another_instance(self):
+        other = StateManager(self.db_path)
+        try:
+            other.mark_processed("0002", "AMD", "2026-01-01")
+        finally:
+            other.close()
+        self.assertTrue(self.state.is_processed("0002"))
+
+    def test_processed_count_tracks_inserts_and_deletes(self):
+        self.state.mark_processed_bulk([("0001", "NVDA", "2026-01-01"), ("0002", "AMD", "2026-01-02")])
+        self.state.mark_processed("0001", "NVDA", "2026-01-01")
+        self.assertEqual(self.state.get_processed_count(), 2)
+
+        self.state.conn.execute("DELETE FROM processed_filings WHERE accession_number = '0001'")
+        self.assertEqual(self.state.get_processed_count(), 1)
+
+    def test_counter_is_seeded_for_existing_databases(self):
+        self.state.mark_processed("0001", "NVDA", "2026-01-01")
+        self.state.conn.execute("DROP TABLE counters")
+        self.state.conn.execute("PRAGMA user_version = 1")
+        self.state.close()
+
+        self.state = StateManager(self.db_path)
+        self.assertEqual(self.state.get_processed_count(), 1)
+
+    def test_schema_version_is_stamped(self):
+        version = self.state.conn.execute("PRAGMA user_version").fetchone()[0]
+        self.assertGreaterEqual(version, 1)
+
+    def test_applies_connection_pragmas(self):
+        conn = self.state.conn
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA busy_timeout").fetchone()[0], 5000)
+
+    def test_shared_across_threads(self):
+        def worker(n):
+            for i in range(20):
+                self.state.mark_processed(f"{n}-{i}", "NVDA", "2026-01-01")
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(self.state.get_processed_count(), 80)
+
+
+class TestStateManagerPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "state.db")
+        self.pool = StateManagerPool(self.db_path, size=2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmpdir.cleanup()
+
+    def test_acquire_returns_manager_to_pool(self):
+        with self.pool.acquire() as state:
+            state.mark_processed("0001", "NVDA", "2026-01-01")
+            self.assertEqual(self.pool._q.qsize(), 1)
+        self.assertEqual(self.pool._q.qsize(), 2)
+
+    def test_pooled_managers_share_the_database(self):
+        with self.pool.acquire() as first, self.pool.acquire() as second:
+            self.assertIsNot(first, second)
+            first.mark_processed("0001", "NVDA", "2026-01-01")
+            self.assertTrue(second.is_processed("0001"))
+
+if __name__ == '__main__':
+    unittest.main()